@@ -142,7 +142,9 @@ class Proto:
     def _recv_len(self, length: int) -> Optional[bytes]:
         if self._x is None:
             return None
-        result = b""
+        # Grow a single buffer in place rather than concatenating bytes,
+        # which copies the whole chunk received so far on every recv().
+        result = bytearray()
         while length > 0:
             if len(self._buf) > 0:
                 len2 = min(length, len(self._buf))
@@ -156,7 +158,7 @@ class Proto:
                     return None
                 result += recvd
                 length -= len(recvd)
-        return result
+        return bytes(result)
 
     def _close(self) -> None:
         if self._x is not None:
@@ -328,19 +330,20 @@ def init(name: str) -> None:
 
 def mkdir_if_ne(path: str) -> None:
     """mkdir if not exists"""
-    if not os.path.exists(path):
-        try:
-            logging.info(f"Creating output directory {path!r}")
-            os.mkdir(path)
-        except FileNotFoundError:
-            logging.fatal(
-                f"Could not create directory {path!r}. "
-                "Make sure all intermediate directories exist."
-            )
-            exit(1)
+    # Try mkdir directly instead of checking os.path.exists() first: one
+    # syscall in the common case and no check-then-create race.
+    try:
+        os.mkdir(path)
+    except FileExistsError:
+        test_write_permission(path)
         return
-
-    test_write_permission(path)
+    except FileNotFoundError:
+        logging.fatal(
+            f"Could not create directory {path!r}. "
+            "Make sure all intermediate directories exist."
+        )
+        exit(1)
+    logging.info(f"Created output directory {path!r}")
 
 
 def test_write_permission(path: str) -> None:
@@ -17,14 +17,25 @@
 from __future__ import annotations
 from decimal import Decimal
 from enum import Enum
-from ipaddress import ip_address
-from typing import Any, Callable, Optional, Dict, Tuple, List, Set, NoReturn, Union
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    Dict,
+    Iterator,
+    Tuple,
+    List,
+    Set,
+    NoReturn,
+    Union,
+)
 import argparse
 import atexit
 import builtins
-import configparser
+import contextlib
 import datetime
 import logging
+import mmap
 import os
 import re
 import shutil
@@ -44,18 +55,6 @@ PTD_READ_ALL_COMMAND_AC_MULTICH = "RL,*,*"
 PTD_READ_ALL_COMMAND_AC = "RL"
 PTD_READ_ALL_COMMAND_DC = "DC-RL"
 
-RE_PTD_LOG = re.compile(
-    r"""^
-        Time,  [^,]*,
-        Watts, [^,]*,
-        Volts, (?P<v> [^,]* ),
-        Amps,  (?P<a> [^,]* ),
-        PF, [^,]*,
-        Mark,  (?P<mark> [^,]* )
-    """,
-    re.X,
-)
-
 ANALYZER_SLEEP_SECONDS: float = 10
 _debug = os.getenv("MLPP_DEBUG") is not None
 
@@ -184,6 +183,11 @@ class Parser:
     def decimal(self) -> Any:
         return self._next(Decimal, "Decimal")
 
+    def number(self) -> Tuple[float, builtins.str]:
+        """Parse the next word as float, keeping its original text."""
+        value = self.words[self._cur_number]
+        return self._next(float, "float"), value
+
     def str(self) -> builtins.str:
         num, self._cur_number = self._cur_number, self._cur_number + 1
         return self.words[num]
@@ -202,83 +206,172 @@ class Parser:
         return self._cur_number >= len(self.words) - 1
 
 
-def max_volts_amps_avg_watts(
-    log_fname: str, mark: str, start_channel: int, amount_of_channels: int
-) -> Tuple[str, str, str]:
-    maxVolts = Decimal("-1")
-    maxAmps = Decimal("-1")
-    avgWatts = Decimal("-1")
+@contextlib.contextmanager
+def _map_log(log_fname: str) -> Iterator[Union[bytes, mmap.mmap]]:
+    """Map the PTDaemon log into memory so it can be scanned in one pass."""
+    with open(log_fname, "rb") as f:
+        # mmap refuses to map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        # The log is scanned front to back, let the kernel read ahead
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+
+
+def _iter_marked_lines(log: Union[bytes, mmap.mmap], mark: bytes) -> Iterator[bytes]:
+    """Yield the lines having `mark` in the Mark column.
+
+    Candidate lines are located by searching for the literal ",Mark,<mark>"
+    so that the lines of other marks never reach the regex.
+    """
+    needle = b",Mark," + mark
+    pos = 0
+    while True:
+        idx = log.find(needle, pos)
+        if idx == -1:
+            return
+        start = log.rfind(b"\n", 0, idx) + 1
+        end = log.find(b"\n", idx)
+        if end == -1:
+            end = len(log)
+        pos = end + 1
+        after = idx + len(needle)
+        if after == end or log[after : after + 1] in (b",", b"\r"):
+            yield log[start:end]
+
+
+def _ptd_log_mark(line: bytes) -> Optional[bytes]:
+    """Return the Mark column of a PTDaemon log line, None if it is not a
+    power sample line."""
+    # The column layout is fixed, a single split is cheaper than a regex.
+    words = line.split(b",", 12)
+    if (
+        len(words) >= 12
+        and words[0] == b"Time"
+        and words[2] == b"Watts"
+        and words[4] == b"Volts"
+        and words[6] == b"Amps"
+        and words[8] == b"PF"
+        and words[10] == b"Mark"
+    ):
+        return words[11]
+    return None
+
+
+def scan_log(
+    log_fname: str,
+    mark: str,
+    channels: Optional[Tuple[int, int]] = None,
+    collect_log: bool = True,
+) -> Tuple[bytes, Optional[Tuple[str, str, str]]]:
+    """Collect the log lines for `mark` and, if `channels` (start channel and
+    amount of channels) is given, their max volts, max amps and avg watts, in
+    a single pass over the log.  With `collect_log=False` the lines are not
+    kept and empty bytes are returned in their place."""
+    # TODO: The log file grows over time and never cleared.
+    #       Probably, we need to fseek() here instead of reading from the start.
+    result = bytearray()
+    # Values are compared as floats, but the original text is returned
+    maxVolts, maxAmps = -1.0, -1.0
+    maxVolts_str: Optional[str] = None
+    maxAmps_str: Optional[str] = None
     watts = []
-    with open(log_fname, "r") as f:
-        for line in f:
-            m = RE_PTD_LOG.match(line.rstrip("\r\n"))
-            if m and m["mark"] == mark:
-                parser = Parser(line)
-                parser.lit("Time")
+    mark_bytes = mark.encode()
+    with _map_log(log_fname) as mm:
+        for candidate in _iter_marked_lines(mm, mark_bytes):
+            line = candidate.rstrip(b"\r")
+            if _ptd_log_mark(line) != mark_bytes:
+                continue
+            if collect_log:
+                result += line
+                result += b"\n"
+            if channels is None:
+                continue
+            start_channel, amount_of_channels = channels
+            parser = Parser(line.decode())
+            parser.lit("Time")
+            parser.skip()
+            parser.lit("Watts")
+            if amount_of_channels == 0:
+                watts_raw = parser.decimal()
+                if watts_raw > 0:
+                    watts.append(watts_raw)
+            else:
                 parser.skip()
-                parser.lit("Watts")
-                if amount_of_channels == 0:
-                    watts_raw = parser.decimal()
-                    if watts_raw > 0:
-                        watts.append(watts_raw)
+            parser.lit("Volts")
+            volts, volts_str = parser.number()
+            parser.lit("Amps")
+            amps, amps_str = parser.number()
+            parser.lit("PF")
+            parser.skip()
+            parser.lit("Mark")
+            parser.skip()
+            if volts > maxVolts:
+                maxVolts, maxVolts_str = volts, volts_str
+            if amps > maxAmps:
+                maxAmps, maxAmps_str = amps, amps_str
+            channel_range = list(
+                range(start_channel, start_channel + amount_of_channels)
+            )
+            while not parser.is_finished():
+                is_sutable_channel = True
+                if not parser.check(f"Ch{channel_range[0]}"):
+                    is_sutable_channel = False
                 else:
-                    parser.skip()
+                    channel_range.pop(0)
+                parser.skip()
+                parser.lit("Watts")
+                watts_raw = parser.decimal()
                 parser.lit("Volts")
-                volts = parser.decimal()
+                volts, volts_str = parser.number()
                 parser.lit("Amps")
-                amps = parser.decimal()
+                amps, amps_str = parser.number()
                 parser.lit("PF")
                 parser.skip()
-                parser.lit("Mark")
-                parser.skip()
-                maxVolts = max(maxVolts, volts)
-                maxAmps = max(maxAmps, amps)
-                channel_range = list(
-                    range(start_channel, start_channel + amount_of_channels)
+                if is_sutable_channel:
+                    if volts > maxVolts:
+                        maxVolts, maxVolts_str = volts, volts_str
+                    if amps > maxAmps:
+                        maxAmps, maxAmps_str = amps, amps_str
+                    if watts_raw > 0:
+                        watts.append(watts_raw)
+                if len(channel_range) == 0:
+                    break
+            if len(channel_range):
+                raise ExtraChannelError(
+                    f"There are extra ptd channels in configuration"
                 )
-                while not parser.is_finished():
-                    is_sutable_channel = True
-                    if not parser.check(f"Ch{channel_range[0]}"):
-                        is_sutable_channel = False
-                    else:
-                        channel_range.pop(0)
-                    parser.skip()
-                    parser.lit("Watts")
-                    watts_raw = parser.decimal()
-                    parser.lit("Volts")
-                    volts = parser.decimal()
-                    parser.lit("Amps")
-                    amps = parser.decimal()
-                    parser.lit("PF")
-                    parser.skip()
-                    if is_sutable_channel:
-                        maxVolts = max(maxVolts, volts)
-                        maxAmps = max(maxAmps, amps)
-                        if watts_raw > 0:
-                            watts.append(watts_raw)
-                    if len(channel_range) == 0:
-                        break
-                if len(channel_range):
-                    raise ExtraChannelError(
-                        f"There are extra ptd channels in configuration"
-                    )
+    log = bytes(result)
+    if channels is None:
+        return log, None
+    if maxVolts_str is None or maxAmps_str is None:
+        raise MaxVoltsAmpsNegativeValuesError(
+            f"Could not find non-negative volts and amps values for {mark!r}"
+        )
     if len(watts) >= 1:
         avgWatts = Decimal(sum(watts) / len(watts))
     else:
         avgWatts = Decimal(-1)
-    return str(maxVolts), str(maxAmps), str("%.6f" % avgWatts)
+    return log, (maxVolts_str, maxAmps_str, str("%.6f" % avgWatts))
 
 
-def read_log(log_fname: str, mark: str) -> str:
-    # TODO: The log file grows over time and never cleared.
-    #       Probably, we need to fseek() here instead of reading from the start.
-    result = []
-    with open(log_fname, "r") as f:
-        for line in f:
-            m = RE_PTD_LOG.match(line.rstrip("\r\n"))
-            if m and m["mark"] == mark:
-                result.append(line)
-    return "".join(result)
+def max_volts_amps_avg_watts(
+    log_fname: str, mark: str, start_channel: int, amount_of_channels: int
+) -> Tuple[str, str, str]:
+    _, values = scan_log(
+        log_fname, mark, (start_channel, amount_of_channels), collect_log=False
+    )
+    assert values is not None
+    return values
+
+
+def read_log(log_fname: str, mark: str) -> bytes:
+    return scan_log(log_fname, mark)[0]
 
 
 def exit_with_error_msg(error_msg: str) -> NoReturn:
@@ -298,9 +391,12 @@ def get_host_port_from_listen_string(listen_str: str) -> Tuple[str, int]:
     except ValueError:
         raise ValueError(f"could not parse listen option {listen_str}")
     try:
-        ip_address(host)
-    except ValueError:
-        raise ValueError(f"wrong listen option ip address {ip_address}")
+        socket.inet_pton(socket.AF_INET, host)
+    except OSError:
+        try:
+            socket.inet_pton(socket.AF_INET6, host)
+        except OSError:
+            raise ValueError(f"wrong listen option ip address {host}")
     try:
         int_port = int(port)
     except ValueError:
@@ -308,13 +404,76 @@ def get_host_port_from_listen_string(listen_str: str) -> Tuple[str, int]:
     return (host, int_port)
 
 
+# One line of an INI file: blank, comment, [section], option: value (or
+# option = value).  Anything else ends up in the `error` group.
+_RE_INI = re.compile(
+    r"""^[ \t]*(?:
+        [\#;].*
+      | \[(?P<section>[^\]]+)\]
+      | (?P<option>[^=:\s][^=:\n]*?) [ \t]* [:=] [ \t]* (?P<value>.*?)
+      | (?P<error>\S.*?)
+    )?[ \t]*$""",
+    re.M | re.X,
+)
+
+# file name -> ((mtime in ns, size), parsed sections)
+# The server reads its configuration once at startup; the cache only pays off
+# if the configuration is ever reloaded.
+_CONFIG_CACHE: Dict[str, Tuple[Tuple[int, int], Dict[str, Dict[str, str]]]] = {}
+
+
+def read_config(filename: str) -> Dict[str, Dict[str, str]]:
+    """Read a simple INI file into {section: {option: value}}.
+
+    Option names are lowercased, as configparser does. The result is cached
+    until the file modification time or size changes; callers get a copy.
+    """
+    st = os.stat(filename)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _CONFIG_CACHE.get(filename)
+    if cached is not None and cached[0] == key:
+        return {name: dict(options) for name, options in cached[1].items()}
+
+    with open(filename) as f:
+        data = f.read()
+
+    sections: Dict[str, Dict[str, str]] = {}
+    section: Optional[Dict[str, str]] = None
+
+    def error(m: re.Match[str], msg: str) -> ValueError:
+        lineno = data.count("\n", 0, m.start()) + 1
+        return ValueError(f"line {lineno}: {msg}")
+
+    for m in _RE_INI.finditer(data):
+        if m["error"] is not None:
+            raise error(m, f"could not parse {m['error']!r}")
+        if m["section"] is not None:
+            if m["section"] in sections:
+                raise error(m, f"section {m['section']!r} already exists")
+            section = sections[m["section"]] = {}
+        elif m["option"] is not None:
+            if section is None:
+                raise error(m, "option is outside of a section")
+            option = m["option"].lower()
+            if option in section:
+                raise error(m, f"option {option!r} already exists")
+            section[option] = m["value"]
+
+    _CONFIG_CACHE[filename] = (
+        key,
+        {name: dict(options) for name, options in sections.items()},
+    )
+    return sections
+
+
 class ServerConfig:
     def __init__(self, filename: str) -> None:
-        conf = configparser.ConfigParser()
         try:
-            conf.read_file(open(filename))
+            conf = read_config(filename)
         except FileNotFoundError:
             exit_with_error_msg(f"Configuration file '{filename}' does not exist.")
+        except ValueError as e:
+            exit_with_error_msg(f"{filename}: config error: {e}")
 
         _UNSET = object()
         used: Dict[str, Set[str]] = {}
@@ -330,12 +489,18 @@ class ServerConfig:
         ) -> Any:
             used.setdefault(section.lower(), set()).add(option.lower())
             if fallback is _UNSET:
-                try:
-                    val = conf.get(section, option)
-                except configparser.Error as e:
-                    exit_with_error_msg(f"{filename}: config error: {e}")
+                if section not in conf:
+                    exit_with_error_msg(
+                        f"{filename}: config error: no section {section!r}"
+                    )
+                if option.lower() not in conf[section]:
+                    exit_with_error_msg(
+                        f"{filename}: config error: "
+                        f"no option {option!r} in section {section!r}"
+                    )
+                val = conf[section][option.lower()]
             else:
-                val = conf.get(section, option, fallback=fallback)
+                val = conf.get(section, {}).get(option.lower(), fallback)
 
             if parse is not None and isinstance(val, str):
                 try:
@@ -436,14 +601,16 @@ class ServerConfig:
             }
 
         for section, used_items in used.items():
-            unused_options = conf[section].keys() - set((i.lower() for i in used_items))
+            # Both sides are lowercased already: read_config() lowercases
+            # option names, get() records them lowercased.
+            unused_options = conf.get(section, {}).keys() - used_items
             if len(unused_options) != 0:
                 logging.warning(
                     f"{filename}: ignoring unknown options in section {section!r}: "
                     f"{', '.join(unused_options)}"
                 )
 
-        unused_sections = set(conf.sections()) - {"server", "ptd"}
+        unused_sections = set(conf) - {"server", "ptd"}
         if len(unused_sections) != 0:
             logging.warning(
                 f"{filename}: ignoring unknown sections: {', '.join(unused_sections)}"
@@ -554,29 +721,37 @@ class Ptd:
 
         # Linux PTDaemon connected to WT333E over USB takes 17 seconds to fire
         # up.  We wait for 30 seconds to be sure.
-        retries = 300
+        deadline = time.monotonic() + 30
+        # Usually PTDaemon is ready within a fraction of a second, so poll
+        # often at first and back off exponentially.
+        delay = 0.005
 
         s = None
-        while s is None and retries > 0:
+        while s is None and time.monotonic() < deadline:
             if self._process is not None and self._process.poll() is not None:
                 raise RuntimeError(
                     f"Analyzer [{self._analyzer}] says PTDaemon unexpectedly terminated"
                 )
                 # raise RuntimeError("PTDaemon unexpectedly terminated")
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             try:
-                s.connect(("127.0.0.1", self._port))
-            except ConnectionRefusedError:
+                s = socket.create_connection(("127.0.0.1", self._port), timeout=0.2)
+            except OSError:
                 if common.sig.stopped:
                     exit()
-                time.sleep(0.1)
-                s = None
-                retries -= 1
+                time.sleep(delay)
+                delay = min(delay * 2, 0.25)
         if s is None:
             self.terminate()
             raise RuntimeError(
                 f"Analyzer [{self._analyzer}] could not connect to PTDaemon"
             )
+        s.settimeout(None)
+        # Commands and replies are short, do not let Nagle's algorithm delay
+        # them.  Keepalive detects a dead PTDaemon connection instead of
+        # blocking on it.
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 16)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
         self._socket = s
         self._proto = common.Proto(s)
 
@@ -744,6 +919,17 @@ class Server:
         self._last_session: Optional[str] = None
         self._last_session_dir_path: Optional[str] = None
         self._ptd: Optional[Ptd] = None
+        self._dispatch: Dict[
+            str, Callable[[List[str], common.Proto], Optional[str]]
+        ] = {
+            "time": self._cmd_time,
+            "set_ntp": self._cmd_set_ntp,
+            "stop": self._cmd_stop,
+            "new": self._cmd_new,
+            "session": self._cmd_session,
+            "download": self._cmd_download,
+            "cleanup": self._cmd_cleanup,
+        }
 
     def handle_connection(self, p: common.Proto) -> None:
         p.enable_keepalive()
@@ -791,12 +977,16 @@ class Server:
                 if reply is None:
                     continue
 
-                if len(reply) < 1000:
-                    logging.info(f"Sending reply to client {reply!r}")
-                else:
-                    logging.info(
-                        f"Sending reply to client {reply[:50]!r}... len={len(reply)}"
-                    )
+                # Replies may be large, format them only if they are logged
+                if logging.getLogger().isEnabledFor(logging.INFO):
+                    if len(reply) < 1000:
+                        logging.info("Sending reply to client %r", reply)
+                    else:
+                        logging.info(
+                            "Sending reply to client %r... len=%d",
+                            reply[:50],
+                            len(reply),
+                        )
 
                 if self._summary is not None:
                     self._summary.message((cmd, cmd_time), (reply, time.time()))
@@ -813,82 +1003,95 @@ class Server:
             self._last_session = self._last_session_dir_path = None
 
     def _handle_cmd(self, cmd: str, p: common.Proto) -> Optional[str]:
-        cmd = cmd.split(",")
-        if len(cmd) == 0:
-            return "..."
-        if cmd[0] == "time":
-            return str(time.time())
-        if cmd[0] == "set_ntp":
-            time_sync.set_ntp(self._config.ntp_server)
-            return "OK"
-        if cmd[0] == "stop":
-            logging.info("The server will be stopped after processing this client")
-            self._stop = True
-            return "OK"
-        if cmd[0] == "new" and len(cmd) == 3:
-            if self.session is not None:
-                self.session.drop()
-            if not common.check_label(cmd[1]):
-                return "Error: invalid label"
-            assert self._summary is not None
-            self._summary.client_uuid = uuid.UUID(cmd[2])
-            self._summary.server_uuid = uuid.uuid4()
-            self.session = Session(self, cmd[1])
-            self._summary.session_name = self.session._id
-            self._last_session = self.session._id
-            self._last_session_dir_path = self.session.log_dir_path
-            return f"OK {self.session._id},{self._summary.server_uuid}"
-        if cmd[0] == "session" and len(cmd) >= 3:
-            if self.session is None or (self.session._id != cmd[1] and "*" != cmd[1]):
-                return "Error: unknown session"
-            cmd = cmd[2:]
-
-            unbool = ["Error", "OK"]
-
-            if cmd == ["start", "ranging"]:
-                return unbool[int(self.session.start(Mode.RANGING))]
-            elif cmd[0] == "start" and cmd[1] == "testing" and len(cmd) == 2:
-                return unbool[int(self.session.start(Mode.TESTING))]
-            elif cmd[0] == "start" and cmd[1] == "testing" and len(cmd) == 4:
-                # TODO (PVA added MG) can't pass different values to different analyzers
+        name, _, rest = cmd.partition(",")
+        handler = self._dispatch.get(name)
+        if handler is None:
+            return "Error"
+        return handler(rest.split(",") if rest else [], p)
+
+    def _cmd_time(self, args: List[str], p: common.Proto) -> Optional[str]:
+        return str(time.time())
+
+    def _cmd_set_ntp(self, args: List[str], p: common.Proto) -> Optional[str]:
+        time_sync.set_ntp(self._config.ntp_server)
+        return "OK"
+
+    def _cmd_stop(self, args: List[str], p: common.Proto) -> Optional[str]:
+        logging.info("The server will be stopped after processing this client")
+        self._stop = True
+        return "OK"
+
+    def _cmd_new(self, args: List[str], p: common.Proto) -> Optional[str]:
+        if len(args) != 2:
+            return "Error"
+        if self.session is not None:
+            self.session.drop()
+        if not common.check_label(args[0]):
+            return "Error: invalid label"
+        assert self._summary is not None
+        self._summary.client_uuid = uuid.UUID(args[1])
+        self._summary.server_uuid = uuid.uuid4()
+        self.session = Session(self, args[0])
+        self._summary.session_name = self.session._id
+        self._last_session = self.session._id
+        self._last_session_dir_path = self.session.log_dir_path
+        return f"OK {self.session._id},{self._summary.server_uuid}"
+
+    def _cmd_session(self, args: List[str], p: common.Proto) -> Optional[str]:
+        if len(args) < 2:
+            return "Error"
+        if self.session is None or (self.session._id != args[0] and "*" != args[0]):
+            return "Error: unknown session"
+        cmd = args[1:]
+
+        unbool = ["Error", "OK"]
+
+        if cmd == ["start", "ranging"]:
+            return unbool[int(self.session.start(Mode.RANGING))]
+        elif cmd[0] == "start" and cmd[1] == "testing" and len(cmd) == 2:
+            return unbool[int(self.session.start(Mode.TESTING))]
+        elif cmd[0] == "start" and cmd[1] == "testing" and len(cmd) == 4:
+            # TODO (PVA added MG) can't pass different values to different analyzers
+            for i in range(self._config.analyzer_count):
                 for i in range(self._config.analyzer_count):
-                    for i in range(self._config.analyzer_count):
-                        self.session._maxVolts[i] = cmd[2]
-                        self.session._desirableCurrentRange[i] = cmd[3]
-                        logging.info(
-                            f"Analyzer [{i+1}] set initial values for Amps {cmd[3]} and Volts {cmd[2]}"
-                        )
-                # self.session._maxVolts = cmd[2]
-                # self.session._desirableCurrentRange = cmd[3]
-                r = self.session.start(Mode.TESTING)
-                return unbool[int(r)] if type(r) == bool else str(r)
-
-            if cmd == ["stop", "ranging"]:
-                return unbool[int(self.session.stop(Mode.RANGING))]
-            if cmd == ["stop", "testing"]:
-                return unbool[int(self.session.stop(Mode.TESTING))]
-
-            if cmd == ["done"]:
-                self._drop_session()
-                return "OK"
+                    self.session._maxVolts[i] = cmd[2]
+                    self.session._desirableCurrentRange[i] = cmd[3]
+                    logging.info(
+                        f"Analyzer [{i+1}] set initial values for Amps {cmd[3]} and Volts {cmd[2]}"
+                    )
+            # self.session._maxVolts = cmd[2]
+            # self.session._desirableCurrentRange = cmd[3]
+            r = self.session.start(Mode.TESTING)
+            return unbool[int(r)] if type(r) == bool else str(r)
+
+        if cmd == ["stop", "ranging"]:
+            return unbool[int(self.session.stop(Mode.RANGING))]
+        if cmd == ["stop", "testing"]:
+            return unbool[int(self.session.stop(Mode.TESTING))]
+
+        if cmd == ["done"]:
+            self._drop_session()
+            return "OK"
 
-            return "Error Unknown session command"
+        return "Error Unknown session command"
 
+    def _cmd_download(self, args: List[str], p: common.Proto) -> Optional[str]:
         if (
-            cmd[0] == "download"
-            and cmd[1] == self._last_session
-            and cmd[2] in common.FETCH_FILES_LIST
+            len(args) != 2
+            or args[0] != self._last_session
+            or args[1] not in common.FETCH_FILES_LIST
         ):
-            assert self._last_session_dir_path is not None
-            p.send_file(os.path.join(self._last_session_dir_path, cmd[2]))
-            return None
-
-        if cmd[0] == "cleanup" and cmd[1] == self._last_session:
-            assert self._last_session_dir_path is not None
-            shutil.rmtree(self._last_session_dir_path)
-            return "OK"
-
-        return "Error"
+            return "Error"
+        assert self._last_session_dir_path is not None
+        p.send_file(os.path.join(self._last_session_dir_path, args[1]))
+        return None
+
+    def _cmd_cleanup(self, args: List[str], p: common.Proto) -> Optional[str]:
+        if len(args) != 1 or args[0] != self._last_session:
+            return "Error"
+        assert self._last_session_dir_path is not None
+        shutil.rmtree(self._last_session_dir_path)
+        return "OK"
 
     def _drop_session(self) -> None:
         if self.session is None:
@@ -1279,18 +1482,17 @@ class Session:
                 shutil.copyfile(input_files[0], output_file)
             logging.info(f"Merging ptd log files into one file")
             for i in range(self._server._config.analyzer_count):
+                # Copy in chunks to avoid holding the whole PTDaemon log in memory
                 with open(
                     os.path.join(
                         self._ptd[i]._log_dir_path, f"ptd_logs_analyzer_{i+1}.txt"
                     ),
                     "r",
-                ) as f:
-                    log_data = f.read()
-                with open(
+                ) as f_in, open(
                     os.path.join(self._ptd[i]._log_dir_path, "ptd_logs.txt"), "a+"
                 ) as f:
                     f.write("Analyzer " + str(i + 1) + "\n")
-                    f.write(log_data)
+                    shutil.copyfileobj(f_in, f, 1024 * 1024)
             return True
 
         # Unexpected state
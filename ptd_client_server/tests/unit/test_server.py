@@ -109,3 +109,82 @@ def test_max_volts_amps_avg_watts(tmp_path: Path) -> None:
     with pytest.raises(server.LitNotFoundError) as excinfo:
         server.max_volts_amps_avg_watts(str(tmp_path / "logs_tmp"), "notset1", 1, 3)
     assert "Expected 'Watts', got 'Watts1'" in str(excinfo.value)
+
+
+def test_scan_log(tmp_path: Path) -> None:
+    with open(tmp_path / "logs_tmp", "wb") as f:
+        f.write(
+            b"Time,01-22-2021 15:05:13.313,NOTICE,Starting\r\n"
+            b"Time,01-22-2021 15:05:14.313,Watts,22.970000,Volts,227.370000,Amps,0.204340,PF,0.494400,Mark,ranging\r\n"
+            b"Time,01-22-2021 15:05:15.322,Watts,25.650000,Volts,228.010000,Amps,0.225410,PF,0.500600,Mark,testing\r\n"
+            b"Time,01-22-2021 15:05:16.322,Watts,27.000000,Volts,227.900000,Amps,0.230000,PF,0.500600,Mark,ranging"
+        )
+
+    assert server.scan_log(str(tmp_path / "logs_tmp"), "ranging", (0, 0)) == (
+        b"Time,01-22-2021 15:05:14.313,Watts,22.970000,Volts,227.370000,Amps,0.204340,PF,0.494400,Mark,ranging\n"
+        b"Time,01-22-2021 15:05:16.322,Watts,27.000000,Volts,227.900000,Amps,0.230000,PF,0.500600,Mark,ranging\n",
+        ("227.900000", "0.230000", "24.985000"),
+    )
+    assert server.scan_log(str(tmp_path / "logs_tmp"), "testing") == (
+        b"Time,01-22-2021 15:05:15.322,Watts,25.650000,Volts,228.010000,Amps,0.225410,PF,0.500600,Mark,testing\n",
+        None,
+    )
+
+    assert server.scan_log(
+        str(tmp_path / "logs_tmp"), "ranging", (0, 0), collect_log=False
+    ) == (b"", ("227.900000", "0.230000", "24.985000"))
+
+    with pytest.raises(server.MaxVoltsAmpsNegativeValuesError):
+        server.scan_log(str(tmp_path / "logs_tmp"), "notset", (0, 0))
+
+    open(tmp_path / "empty", "wb").close()
+    assert server.scan_log(str(tmp_path / "empty"), "ranging") == (b"", None)
+
+
+def test_read_config(tmp_path: Path) -> None:
+    with open(tmp_path / "server.conf", "w") as f:
+        f.write(
+            "# comment\n"
+            "[server]\n"
+            "ntpServer: ntp.example.com\n"
+            "listen = 127.0.0.1 4950\n"
+            "\n"
+            "[ptd]\n"
+            "; comment\n"
+            "ptd: D:\\PTD\\ptd-windows-x86.exe\n"
+            "interfaceFlag:\n"
+        )
+
+    conf = server.read_config(str(tmp_path / "server.conf"))
+    assert conf == {
+        "server": {"ntpserver": "ntp.example.com", "listen": "127.0.0.1 4950"},
+        "ptd": {"ptd": "D:\\PTD\\ptd-windows-x86.exe", "interfaceflag": ""},
+    }
+    conf["server"]["listen"] = "changed"
+    assert server.read_config(str(tmp_path / "server.conf"))["server"] == {
+        "ntpserver": "ntp.example.com",
+        "listen": "127.0.0.1 4950",
+    }
+
+    with open(tmp_path / "bad.conf", "w") as f:
+        f.write("ntpServer: ntp.example.com\n")
+    with pytest.raises(ValueError):
+        server.read_config(str(tmp_path / "bad.conf"))
+
+    with open(tmp_path / "bad2.conf", "w") as f:
+        f.write("[server]\nntpServer\n")
+    with pytest.raises(ValueError) as excinfo:
+        server.read_config(str(tmp_path / "bad2.conf"))
+    assert "line 2" in str(excinfo.value)
+
+    with open(tmp_path / "bad3.conf", "w") as f:
+        f.write("[server]\nntpServer\nlisten = 127.0.0.1 4950\n")
+    with pytest.raises(ValueError) as excinfo:
+        server.read_config(str(tmp_path / "bad3.conf"))
+    assert "line 2" in str(excinfo.value)
+
+    with open(tmp_path / "bad4.conf", "w") as f:
+        f.write("[server]\nntpServer\n# see: README.md\n")
+    with pytest.raises(ValueError) as excinfo:
+        server.read_config(str(tmp_path / "bad4.conf"))
+    assert "line 2" in str(excinfo.value)